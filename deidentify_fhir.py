@@ -1,53 +1,138 @@
-#!/usr/bin/env python3
-"""
-deidentify_fhir.py
-------------------
-De-identifies a FHIR JSON resource.
-
-Usage
-=====
-    python deidentify_fhir.py <input.json> [-o OUTPUT] [--salt SALT] [--shift-days N]
-                               [--policy POLICY.json] [--verbose]
-
-The script:
-  • removes direct identifiers (name, address, telecom, MRN, photos, etc.)
-  • replaces identifiers you still need with deterministic SHA-256 hashes
-  • shifts every date | dateTime | instant by N days (default ±90, deterministic)
-  • preserves everything else (codes, values, references, extensions)
-
-Dependencies
-============
-Only the Python stdlib – no external packages required.
-Tested on Python 3.9 – 3.12.
-
-Author
-======
-Joe Bartlett — Apr 2025
-"""
-from __future__ import annotations
-
-import argparse
-import datetime as _dt
-import hashlib
-import json
-import os
+#!/usr/bin/env python3
+"""
+deidentify_fhir.py
+------------------
+De-identifies a FHIR JSON resource.
+
+Usage
+=====
+    python deidentify_fhir.py <input.json> [-o OUTPUT] [--salt SALT] [--shift-days N]
+                               [--policy POLICY.json] [--compact] [--ndjson] [--jobs N]
+                               [--verbose]
+
+The script:
+  • removes direct identifiers (name, address, telecom, MRN, photos, etc.)
+  • replaces identifiers you still need with deterministic SHA-256 hashes
+  • shifts every date | dateTime | instant by N days (default ±90, deterministic)
+  • preserves everything else (codes, values, references, extensions)
+
+Dependencies
+============
+Only the Python stdlib – no external packages required. If ``orjson`` is
+installed it is used for faster JSON serialisation, and ``google-re2`` (if
+present) gives FHIR date detection a linear-time regex engine.
+Tested on Python 3.9 – 3.12.
+
+Performance
+===========
+The tool is interpreter-bound, not compute-bound. Profiling a 100k-entry
+Bundle (``scripts/profile_deid.py``) puts ~95% of de-identification time in
+the dict/list walk of ``recursively_deidentify`` and its per-node
+bookkeeping; the SHA-256 work itself is ~1-2%. SIMD/SHA-NI style hashing
+work cannot pay off here – reduce per-node Python work, cache repeated
+values, or avoid whole passes instead, and re-profile before optimising
+hashing or serialisation for a specific workload.
+
+Author
+======
+Joe Bartlett — Apr 2025
+"""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime as _dt
+import functools
+import hashlib
+import itertools
+import json
+import math
+import os
 import random
 import re
 import sys
-from pathlib import Path
-from typing import Any, Dict, List
-
-##########################
-# 1.  CONFIGURATION      #
-##########################
-
-# Fields to *remove* for each resourceType.
-# Hash-pseudonymisation is used for elements in HASHED_FIELDS (identifiers you may still
-# need for linkage). Adjust to your internal policy as required.
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, TextIO
+
+try:  # optional – much faster JSON serialisation when available
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+try:  # optional – DFA-based regex engine, linear time on every input
+    import re2
+except ImportError:  # pragma: no cover - exercised only without google-re2
+    re2 = None
+
+##########################
+# 1.  CONFIGURATION      #
+##########################
+
+# Policy versions are unique across all PolicyDict instances, so a version
+# number alone identifies one state of one policy.
+_POLICY_VERSIONS = itertools.count(1)
+
+
+class PolicyDict(dict):
+    """``dict`` that records a new ``version`` every time it is modified.
+
+    Lookups derived from the policy (see ``_phi_field_sets``) are cached per
+    version, so they are rebuilt only after the policy actually changes.
+    Editing a field list in place (``PHI_POLICY["Patient"].append(...)``) is
+    not detected – assign a new list instead.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.version = next(_POLICY_VERSIONS)
+
+    def _bump(self) -> None:
+        self.version = next(_POLICY_VERSIONS)
+
+    def __setitem__(self, key: str, value: List[str]) -> None:
+        super().__setitem__(key, value)
+        self._bump()
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self._bump()
+
+    def __ior__(self, other: Any) -> "PolicyDict":
+        self.update(other)
+        return self
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self._bump()
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        value = super().setdefault(key, default)
+        self._bump()
+        return value
+
+    def pop(self, *args: Any) -> Any:
+        value = super().pop(*args)
+        self._bump()
+        return value
+
+    def popitem(self) -> tuple:
+        item = super().popitem()
+        self._bump()
+        return item
+
+    def clear(self) -> None:
+        super().clear()
+        self._bump()
+
+
+# Fields to *remove* for each resourceType.
+# Hash-pseudonymisation is used for elements in HASHED_FIELDS (identifiers you may still
+# need for linkage). Adjust to your internal policy as required.
 # Built-in Safe-Harbor oriented policy. Can be extended/overridden via --policy.
 # This list aims to remove all 18 HIPAA identifiers when feasible within generic FHIR.
 # NOTE: A single static list can never be fully complete; review for your dataset.
-PHI_POLICY: Dict[str, List[str]] = {
+PHI_POLICY: Dict[str, List[str]] = PolicyDict({
     # Core demographics
     "Patient": [
         "identifier",              # hashed if in HASHED_IDENTIFIER_SYSTEMS
@@ -83,10 +168,10 @@ PHI_POLICY: Dict[str, List[str]] = {
     "ImagingStudy": ["identifier"],
     # Fallback
     "*": ["identifier"],
-}
-
-# Which identifier systems should be hashed rather than removed.
-# Extend as needed (MRN, SSN, etc.)
+})
+
+# Which identifier systems should be hashed rather than removed.
+# Extend as needed (MRN, SSN, etc.)
 # Identifier.system values that are retained (after hashing). Any identifier
 # with a system not listed here is removed entirely.
 HASHED_IDENTIFIER_SYSTEMS = {
@@ -98,27 +183,146 @@ HASHED_IDENTIFIER_SYSTEMS = {
 # unchanged is strongly discouraged and will trigger a runtime warning.
 DEFAULT_SALT_PLACEHOLDER = "change-me-salt"
 
-FHIR_DATE_RE = re.compile(
+FHIR_DATE_RE = (re2 or re).compile(
     r"^\d{4}-\d{2}(-\d{2}(T\d{2}:\d{2}(:\d{2}(?:\.\d{1,6})?)?(Z|[+-]\d{2}:\d{2})?)?)?$"
 )
-DATE_KEY_SUFFIXES = ("date", "datetime", "instant")
-
-##########################
-# 2.  CORE LOGIC         #
-##########################
-
-
-def load_resource(path: str | os.PathLike) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_resource(resource: Dict[str, Any], output_path: str | os.PathLike) -> None:
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(resource, f, indent=2, ensure_ascii=False)
-        f.write("\n")
-
-
+# Element names whose string values are always treated as FHIR dates. FHIR
+# element names are camelCase and stable, so these are matched exactly (no
+# lower-casing) together with the common type suffixes below. Values under any
+# other key are still shifted when they match FHIR_DATE_RE.
+DATE_KEYS = frozenset(
+    {
+        "date",
+        "dateTime",
+        "instant",
+        "issued",
+        "authoredOn",
+        "recorded",
+        "created",
+        "lastUpdated",
+        "timestamp",
+        "start",
+        "end",
+    }
+)
+DATE_KEY_SUFFIXES = ("Date", "DateTime", "Instant")
+
+# Bundles with fewer entries than this are always processed in-process; below
+# it the cost of starting workers and pickling entries outweighs the gain.
+PARALLEL_MIN_ENTRIES = 64
+
+##########################
+# 2.  CORE LOGIC         #
+##########################
+
+
+def _orjson_can_encode(obj: Any) -> bool:
+    """Return ``False`` if ``obj`` holds numbers orjson would alter or reject.
+
+    orjson writes NaN/Infinity as ``null`` and refuses integers outside the
+    64-bit range; the stdlib encoder writes both back unchanged.
+    """
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, float):
+            if not math.isfinite(value):
+                return False
+        elif isinstance(value, int) and not -(2**63) <= value < 2**64:
+            return False
+    return True
+
+
+def _use_orjson(resource: Any, compact: bool, orjson_safe: bool | None = None) -> bool:
+    """Decide once which encoder serialises ``resource``.
+
+    ``orjson_safe`` is what ``_load_json`` recorded for the parsed input; only
+    when it is unknown (``None``) is ``resource`` scanned.
+    """
+    if compact or orjson is None:
+        return False
+    if orjson_safe is None:
+        return _orjson_can_encode(resource)
+    return orjson_safe
+
+
+def _dumps(resource: Any, compact: bool, use_orjson: bool) -> str:
+    if compact:
+        return json.dumps(resource, ensure_ascii=False, separators=(",", ":"))
+    if use_orjson:
+        try:
+            return orjson.dumps(resource, option=orjson.OPT_INDENT_2).decode("utf-8")
+        except orjson.JSONEncodeError:
+            pass  # e.g. non-string keys – let the stdlib handle them
+    return json.dumps(resource, indent=2, ensure_ascii=False)
+
+
+def dumps_resource(
+    resource: Any, *, compact: bool = False, orjson_safe: bool | None = None
+) -> str:
+    """Serialise ``resource`` as JSON text.
+
+    Output is indented by two spaces unless ``compact`` is set, in which case
+    no whitespace is emitted. Indented output uses ``orjson`` when it is
+    installed and can encode the payload unchanged; compact output always uses
+    the stdlib's C encoder, which is faster than that check plus orjson.
+    Pass the ``orjson_safe`` flag returned by ``_load_json`` for the source
+    document to skip re-scanning ``resource`` for that check.
+    """
+    return _dumps(resource, compact, _use_orjson(resource, compact, orjson_safe))
+
+
+def _load_json(f: TextIO) -> tuple[Any, bool]:
+    """Parse JSON from ``f`` and report whether orjson can encode it unchanged.
+
+    The check rides on the parser's hooks, so the document is not walked a
+    second time before output. Without orjson nothing is tracked.
+    """
+    if orjson is None:
+        return json.load(f), False
+    unsafe: List[str] = []
+
+    def parse_constant(name: str) -> float:
+        unsafe.append(name)  # NaN, Infinity, -Infinity
+        return float(name)
+
+    def parse_int(text: str) -> int:
+        value = int(text)
+        # Anything shorter than 20 characters fits in 64 bits
+        if len(text) > 19 and not -(2**63) <= value < 2**64:
+            unsafe.append(text)
+        return value
+
+    resource = json.load(f, parse_constant=parse_constant, parse_int=parse_int)
+    return resource, not unsafe
+
+
+def load_resource(path: str | os.PathLike) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_resource(
+    resource: Dict[str, Any], output_path: str | os.PathLike, *, compact: bool = False
+) -> None:
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(dumps_resource(resource, compact=compact))
+        f.write("\n")
+
+
+@functools.lru_cache(maxsize=32)
+def _salt_context(salt: str) -> Any:
+    """Return a SHA-256 context that has already absorbed ``salt``.
+
+    Callers must ``copy()`` the context before updating it.
+    """
+    return hashlib.sha256(salt.encode("utf-8"))
+
+
 def sha256_hash(value: str, salt: str, length: int | None = None) -> str:
     """Return a SHA-256 hash for ``value`` salted with ``salt``.
 
@@ -126,10 +330,14 @@ def sha256_hash(value: str, salt: str, length: int | None = None) -> str:
     ``length`` is provided the digest is truncated to the specified number of
     characters.
     """
-    digest = hashlib.sha256((salt + value).encode()).hexdigest()
+    # Equivalent to hashing ``salt + value`` but the salt prefix is only
+    # compressed once per salt rather than once per identifier.
+    ctx = _salt_context(salt).copy()
+    ctx.update(value.encode("utf-8"))
+    digest = ctx.hexdigest()
     return digest if length is None else digest[:length]
-
-
+
+
 def pseudonymise_identifier(
     identifier: Dict[str, Any],
     salt: str,
@@ -153,8 +361,37 @@ def pseudonymise_identifier(
     if "system" in identifier:
         masked["system"] = identifier["system"]
     return masked
-
-
+
+
+def _parse_fhir_datetime(core: str) -> _dt.datetime:
+    """Parse ``YYYY-MM-DDThh[:mm[:ss[.ffffff]]]`` with the timezone already removed.
+
+    Raises ``ValueError`` for anything else. Fractional seconds beyond
+    microsecond precision are truncated.
+    """
+    n = len(core)
+    if n < 13 or core[4] != "-" or core[7] != "-" or core[10] not in "T ":
+        raise ValueError(core)
+    fields = [core[:4], core[5:7], core[8:10], core[11:13]]
+    if n > 13:
+        if n < 16 or core[13] != ":":
+            raise ValueError(core)
+        fields.append(core[14:16])
+        if n > 16:
+            if n < 19 or core[16] != ":":
+                raise ValueError(core)
+            fields.append(core[17:19])
+            if n > 19:
+                if n == 20 or core[19] != ".":
+                    raise ValueError(core)
+                fields.append(core[20:26].ljust(6, "0"))
+                fields.append(core[26:])  # validated as digits, then dropped
+    if not "".join(fields).isdigit():
+        raise ValueError(core)
+    return _dt.datetime(*(int(f) for f in fields[:7]))
+
+
+@functools.lru_cache(maxsize=8192)
 def _parse_fhir_date(value: str) -> tuple[_dt.datetime | None, str, int]:
     """Best-effort parse of a FHIR date/dateTime/instant string.
 
@@ -162,6 +399,9 @@ def _parse_fhir_date(value: str) -> tuple[_dt.datetime | None, str, int]:
     ``tz_suffix`` preserves the original timezone designator ("Z" or e.g.
     "+02:00") and ``fractional_precision`` is the number of digits in the
     fractional seconds component (0 if absent) so we can round‑trip exactly.
+
+    Results are memoised: bundles tend to repeat the same timestamps across
+    many resources, so repeated strings cost a single dict lookup.
     """
     try:
         # Separate timezone suffix so we can re-attach later.
@@ -183,13 +423,22 @@ def _parse_fhir_date(value: str) -> tuple[_dt.datetime | None, str, int]:
         if "." in core:
             frac_precision = len(core.split(".")[1])
 
-        if len(core) == 4:
-            dt = _dt.datetime(int(core), 1, 1)
-        elif len(core) == 7:
-            dt = _dt.datetime.strptime(core, "%Y-%m")
-        elif len(core) == 10:
-            dt = _dt.datetime.strptime(core, "%Y-%m-%d")
-        else:
+        # Slice fixed-width fields directly; strptime re-interprets its format
+        # string on every call and dominates the cost of date-heavy bundles.
+        n = len(core)
+        try:
+            if n == 4 and core.isdigit():
+                dt = _dt.datetime(int(core), 1, 1)
+            elif n == 7 and core[4] == "-" and (core[:4] + core[5:]).isdigit():
+                dt = _dt.datetime(int(core[:4]), int(core[5:7]), 1)
+            elif n == 10 and core[4] == core[7] == "-" and (core[:4] + core[5:7] + core[8:]).isdigit():
+                dt = _dt.datetime(int(core[:4]), int(core[5:7]), int(core[8:]))
+            else:
+                dt = _parse_fhir_datetime(core)
+        except ValueError:
+            # Not a strict FHIR form (e.g. "19600412", "+0100" offsets). Fall
+            # back to fromisoformat so such values are still shifted or
+            # collapsed rather than left untouched.
             dt = _dt.datetime.fromisoformat(core)
         return dt, suffix, frac_precision
     except Exception:
@@ -204,9 +453,9 @@ def _format_fhir_date(
     if length == 4:
         return f"{shifted.year:04d}"
     elif length == 7:
-        return shifted.strftime("%Y-%m")
+        return f"{shifted.year:04d}-{shifted.month:02d}"
     elif length == 10:
-        return shifted.strftime("%Y-%m-%d")
+        return shifted.date().isoformat()
     else:
         if frac_precision > 0:
             iso = shifted.isoformat(timespec="microseconds")
@@ -217,9 +466,13 @@ def _format_fhir_date(
             return shifted.isoformat(timespec="seconds") + suffix
 
 
-def shift_date(value: str, offset_days: int, collapse_to_year: bool = False) -> str:
+def shift_date(
+    value: str, offset_days: int | _dt.timedelta, collapse_to_year: bool = False
+) -> str:
     """Shift a FHIR date/dateTime/instant by ``offset_days``.
 
+    ``offset_days`` may be a day count or a precomputed ``timedelta`` (hot
+    callers build it once per resource rather than once per date).
     If ``collapse_to_year`` is True, no shifting occurs and only the year component is
     returned (HIPAA Safe Harbor compliant). Time-zones are preserved otherwise.
     """
@@ -231,11 +484,59 @@ def shift_date(value: str, offset_days: int, collapse_to_year: bool = False) ->
         # Skip shifting entirely when collapsing to year precision
         return f"{dt.year:04d}"
 
-    shifted = dt + _dt.timedelta(days=offset_days)
+    if not isinstance(offset_days, _dt.timedelta):
+        offset_days = _dt.timedelta(days=offset_days)
+    shifted = dt + offset_days
 
     return _format_fhir_date(value, shifted, tz_suffix, frac_precision)
-
-
+
+
+@functools.lru_cache(maxsize=8192)
+def _shift_date_cached(
+    value: str, offset: _dt.timedelta, collapse_to_year: bool
+) -> str | None:
+    """Memoised :func:`shift_date` returning ``None`` if ``value`` does not parse."""
+    if _parse_fhir_date(value)[0] is None:
+        return None
+    return shift_date(value, offset, collapse_to_year=collapse_to_year)
+
+
+# Merged field sets keyed by (PolicyDict.version, safe_harbor)
+_PHI_SETS_CACHE: Dict[tuple, Dict[str, FrozenSet[str]]] = {}
+
+
+def _phi_field_sets(safe_harbor: bool = False) -> Dict[str, FrozenSet[str]]:
+    """Merge ``PHI_POLICY`` into one frozenset of fields per resourceType.
+
+    Each entry includes the generic ``"*"`` rules. In Safe Harbor mode
+    ``birthDate`` is kept (and later collapsed to a year) rather than removed.
+    The result is cached until ``PHI_POLICY`` is modified and must not be
+    mutated by callers. A plain ``dict`` assigned to ``PHI_POLICY`` works too,
+    but is re-merged on every call.
+    """
+    version = getattr(PHI_POLICY, "version", None)
+    if version is not None:
+        cached = _PHI_SETS_CACHE.get((version, safe_harbor))
+        if cached is not None:
+            return cached
+
+    generic = PHI_POLICY.get("*", [])
+    sets: Dict[str, FrozenSet[str]] = {}
+    for resource_type, fields in PHI_POLICY.items():
+        merged = set(fields)
+        if resource_type != "*":
+            merged.update(generic)
+        if safe_harbor:
+            merged.discard("birthDate")
+        sets[resource_type] = frozenset(merged)
+
+    if version is not None:
+        if len(_PHI_SETS_CACHE) >= 8:
+            _PHI_SETS_CACHE.clear()  # drop sets for superseded versions
+        _PHI_SETS_CACHE[(version, safe_harbor)] = sets
+    return sets
+
+
 def recursively_deidentify(
     obj: Any,
     salt: str,
@@ -243,92 +544,178 @@ def recursively_deidentify(
     *,
     collapse_dates: bool = False,
     safe_harbor: bool = False,
+    phi_sets: Dict[str, FrozenSet[str]] | None = None,
+    in_place: bool = False,
 ) -> Any:
-    if isinstance(obj, dict):
-        resource_type = obj.get("resourceType")
-        # Determine which PHI fields apply
-        phi_fields = list(PHI_POLICY.get(resource_type, []))
-        if resource_type != "*":
-            # Append generic rules, avoid duplicates
-            phi_fields += [f for f in PHI_POLICY.get("*", []) if f not in phi_fields]
-        if safe_harbor and "birthDate" in phi_fields:
-            phi_fields.remove("birthDate")
-
-        new_obj: Dict[str, Any] = {}
-        for key, val in obj.items():
-            # Remove PHI fields
-            if key in phi_fields:
-                if key == "identifier":
-                    identifiers = val if isinstance(val, list) else [val]
-                    kept: List[Dict[str, Any]] = []
-
-                    for ident in identifiers:
-                        system = ident.get("system")
+    """Return a de-identified copy of ``obj``.
+
+    Despite the name the walk is iterative: an explicit stack of
+    ``(target_container, slot, source_node)`` frames replaces recursion, so
+    deeply nested input cannot hit ``RecursionError`` and each node avoids the
+    cost of a Python call.
+
+    With ``in_place=True`` no copy is made: PHI is deleted from and dates are
+    rewritten in ``obj``'s own dicts and lists, and ``obj`` itself is
+    returned. Only use it when the caller owns ``obj`` and no longer needs
+    the original values. A dict or list reached more than once (shared by
+    reference) is de-identified only the first time.
+    """
+    # HOT: ~95% of de-identification time on a 100k-entry Bundle is spent in
+    # this loop (see scripts/profile_deid.py); hashing is ~1-2%.
+    if phi_sets is None:
+        phi_sets = _phi_field_sets(safe_harbor)
+    default_fields = phi_sets.get("*", frozenset())
+    offset_td = _dt.timedelta(days=offset_days)
 
+    # Bind every global, builtin and bound method used per node to a local so
+    # the loop body runs on LOAD_FAST instead of LOAD_GLOBAL/LOAD_ATTR.
+    _isinstance = isinstance
+    _len = len
+    _dict = dict
+    _list = list
+    _str = str
+    _containers = (dict, list)
+    _get_phi_fields = phi_sets.get
+    _fullmatch = FHIR_DATE_RE.fullmatch
+    _shift = _shift_date_cached
+    _pseudonymise = pseudonymise_identifier
+    _date_keys = DATE_KEYS
+    _date_suffixes = DATE_KEY_SUFFIXES
+    # Per-key "is this a date element?" decisions, computed once per name
+    date_key_memo: Dict[str, bool] = {}
+    _is_date_key = date_key_memo.get
+    _hashed_systems = HASHED_IDENTIFIER_SYSTEMS
+    # In-place only: ids of containers already rewritten, so shared ones are
+    # not shifted or hashed twice
+    seen: set = set()
+    _seen_add = seen.add
+    _id = id
+
+    root: List[Any] = [obj]
+    stack: List[tuple] = [(root, 0, obj)]
+    _push = stack.append
+    _pop = stack.pop
+    while stack:
+        target, slot, src = _pop()
+        if _isinstance(src, _dict):
+            # Determine which PHI fields apply
+            phi_fields = _get_phi_fields(src.get("resourceType"), default_fields)
+
+            if in_place:
+                target[slot] = src
+                if _id(src) in seen:
+                    continue
+                _seen_add(_id(src))
+                new_obj: Dict[str, Any] = src
+                items: Any = list(src.items())  # snapshot – PHI keys get deleted
+            else:
+                new_obj = {}
+                items = src.items()
+                target[slot] = new_obj
+            for key, val in items:
+                # Remove PHI fields
+                if key in phi_fields:
+                    if key == "identifier":
                         # Keep only whitelisted systems (if system absent we drop)
-                        if system and system in HASHED_IDENTIFIER_SYSTEMS:
-                            processed = pseudonymise_identifier(ident, salt)
-                            if processed:
-                                kept.append(processed)
-
-                    if kept:
-                        new_obj[key] = kept if isinstance(val, list) else kept[0]
-                # Skip all other PHI keys outright
+                        # that carry a value to hash
+                        kept: List[Dict[str, Any]] = [
+                            _pseudonymise(ident, salt)
+                            for ident in (val if _isinstance(val, _list) else (val,))
+                            if ident.get("system") in _hashed_systems
+                            and ident.get("value") is not None
+                        ]
+                        if kept:
+                            new_obj[key] = kept if _isinstance(val, _list) else kept[0]
+                            continue
+                    # Skip all other PHI keys outright
+                    if in_place:
+                        del new_obj[key]
+                    continue
+
+                # Date shifting – only parse strings that look like dates
+                if _isinstance(val, _str):
+                    date_key = _is_date_key(key)
+                    if date_key is None:
+                        date_key = date_key_memo[key] = (
+                            key in _date_keys or key.endswith(_date_suffixes)
+                        )
+                    if date_key:
+                        maybe_date = True
+                    elif _len(val) >= 7 and val[4] == "-" and val[:4].isdigit():
+                        # Cheap "YYYY-" prefilter keeps most strings away from the regex
+                        maybe_date = _fullmatch(val) is not None
+                    else:
+                        maybe_date = False
+                    if maybe_date:
+                        shifted_val = _shift(val, offset_td, collapse_dates)
+                        if shifted_val is not None:
+                            if safe_harbor and key == "birthDate":
+                                try:
+                                    year = int(shifted_val[:4])
+                                    age = _dt.date.today().year - year
+                                    if age >= 90:
+                                        shifted_val = "1900"
+                                except Exception:
+                                    pass
+                            new_obj[key] = shifted_val
+                            continue
+                    new_obj[key] = val
+                elif _isinstance(val, _containers):
+                    # Reserve the slot now so key order is preserved
+                    new_obj[key] = None
+                    _push((new_obj, key, val))
+                else:
+                    new_obj[key] = val  # primitives unchanged
+        elif _isinstance(src, _list):
+            if in_place:
+                target[slot] = src
+                if _id(src) in seen:
+                    continue
+                _seen_add(_id(src))
+                for i, item in enumerate(src):
+                    if _isinstance(item, _containers):
+                        _push((src, i, item))
                 continue
-
-            # Date shifting – only parse strings that look like dates
-            if isinstance(val, str):
-                key_lower = key.lower()
-                if key_lower.endswith(DATE_KEY_SUFFIXES) or FHIR_DATE_RE.fullmatch(val):
-                    dt_obj, _, _ = _parse_fhir_date(val)
-                    if dt_obj is not None:
-                        shifted_val = shift_date(val, offset_days, collapse_to_year=collapse_dates)
-                        if safe_harbor and key == "birthDate":
-                            try:
-                                year = int(shifted_val[:4])
-                                age = _dt.date.today().year - year
-                                if age >= 90:
-                                    shifted_val = "1900"
-                            except Exception:
-                                pass
-                        new_obj[key] = shifted_val
-                        continue
-            # Recurse
-            new_obj[key] = recursively_deidentify(
-                val,
-                salt,
-                offset_days,
-                collapse_dates=collapse_dates,
-                safe_harbor=safe_harbor,
-            )
-        return new_obj
-    elif isinstance(obj, list):
-        return [
-            recursively_deidentify(
-                i, salt, offset_days, collapse_dates=collapse_dates, safe_harbor=safe_harbor
-            )
-            for i in obj
-        ]
-    else:
-        return obj  # primitives unchanged
-
-
-def deterministic_offset(base_salt: str, patient_id: str) -> int:
-    """Returns a deterministic ±offset days (-90..+90) per patient_id."""
-    h = hashlib.sha256((base_salt + patient_id).encode()).digest()
-    rand_int = int.from_bytes(h[:4], "big")
-    return (rand_int % 181) - 90  # 0-180 → -90..+90
-
-
-def deidentify_resource(
+            for item in src:
+                if _isinstance(item, _containers):
+                    break
+            else:
+                # Only primitives: nothing to de-identify, copy at C speed
+                target[slot] = src.copy()
+                continue
+            new_list: List[Any] = [None] * _len(src)
+            target[slot] = new_list
+            for i, item in enumerate(src):
+                if _isinstance(item, _containers):
+                    _push((new_list, i, item))
+                else:
+                    new_list[i] = item
+    return root[0]
+
+
+@functools.lru_cache(maxsize=8192)
+def deterministic_offset(base_salt: str, patient_id: str) -> int:
+    """Returns a deterministic ±offset days (-90..+90) per patient_id."""
+    # Same digest as sha256(base_salt + patient_id), reusing the salted prefix
+    ctx = _salt_context(base_salt).copy()
+    ctx.update(patient_id.encode("utf-8"))
+    rand_int = int.from_bytes(ctx.digest()[:4], "big")
+    return (rand_int % 181) - 90  # 0-180 → -90..+90
+
+
+def _prepare_walk(
     resource: Dict[str, Any],
     salt: str,
     shift_days: int | None,
-    *,
-    safe_harbor: bool = False,
-) -> Dict[str, Any]:
-    """Driver function for a single FHIR resource."""
-    # If patient‐level identifier exists, derive deterministic offset
+    safe_harbor: bool,
+    in_place: bool = False,
+) -> tuple[functools.partial, Dict[str, FrozenSet[str]]]:
+    """Resolve the date offset and policy for ``resource``.
+
+    Returns a picklable ``walk(obj)`` callable that de-identifies any part of
+    ``resource`` with those settings, plus the merged PHI field sets.
+    """
+    # If patient‐level identifier exists, derive deterministic offset
     if resource.get("resourceType") == "Patient":
         patient_id = resource.get("id", "")
     else:
@@ -347,23 +734,187 @@ def deidentify_resource(
     else:
         offset = shift_days if shift_days is not None else deterministic_offset(salt, patient_id)
         collapse = False
-    return recursively_deidentify(
-        resource,
-        salt,
-        offset,
+    phi_sets = _phi_field_sets(safe_harbor)
+    walk = functools.partial(
+        recursively_deidentify,
+        salt=salt,
+        offset_days=offset,
         collapse_dates=collapse,
         safe_harbor=safe_harbor,
+        phi_sets=phi_sets,
+        in_place=in_place,
     )
-
-
-##########################
-# 3.  CLI HANDLER        #
-##########################
-
-def parse_args() -> argparse.Namespace:
-    ap = argparse.ArgumentParser(description="De-identify a FHIR JSON resource.")
-    ap.add_argument("input", help="Path to input FHIR JSON file")
-    ap.add_argument("-o", "--output", help="Output path (default: <input>_deid.json)")
+    return walk, phi_sets
+
+
+def _bundle_entries(
+    resource: Dict[str, Any], phi_sets: Dict[str, FrozenSet[str]]
+) -> List[Any] | None:
+    """Return the entry list of a Bundle that may be processed entry by entry."""
+    entries = resource.get("entry")
+    if (
+        resource.get("resourceType") == "Bundle"
+        and isinstance(entries, list)
+        and "entry" not in phi_sets.get("Bundle", phi_sets.get("*", frozenset()))
+    ):
+        return entries
+    return None
+
+
+def deidentify_resource(
+    resource: Dict[str, Any],
+    salt: str,
+    shift_days: int | None,
+    *,
+    safe_harbor: bool = False,
+    jobs: int = 1,
+    in_place: bool = False,
+) -> Dict[str, Any]:
+    """Driver function for a single FHIR resource.
+
+    When ``jobs`` > 1 and ``resource`` is a Bundle with at least
+    ``PARALLEL_MIN_ENTRIES`` entries, the entries are de-identified in a pool
+    of ``jobs`` worker processes. The output is identical to ``jobs=1``.
+    ``in_place=True`` modifies ``resource`` instead of copying it (see
+    :func:`recursively_deidentify`).
+    """
+    walk, phi_sets = _prepare_walk(resource, salt, shift_days, safe_harbor, in_place)
+
+    entries = _bundle_entries(resource, phi_sets)
+    if jobs > 1 and entries is not None and len(entries) >= PARALLEL_MIN_ENTRIES:
+        # Entries share no state, so each can be handled by a worker. The
+        # merged policy is bound into ``walk`` because workers started with
+        # "spawn" would not see --policy changes made to PHI_POLICY.
+        chunksize = max(16, len(entries) // (jobs * 4))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            # Workers own their unpickled entries, so they can always mutate them
+            worker = functools.partial(walk, in_place=True)
+            deid_entries = list(executor.map(worker, entries, chunksize=chunksize))
+        shell = walk({k: v for k, v in resource.items() if k != "entry"})
+        # Re-insert the entries at their original position
+        return {
+            k: deid_entries if k == "entry" else shell[k]
+            for k in resource
+            if k == "entry" or k in shell
+        }
+
+    return walk(resource)
+
+
+def dump_deidentified(
+    resource: Dict[str, Any],
+    out: TextIO,
+    salt: str,
+    shift_days: int | None,
+    *,
+    safe_harbor: bool = False,
+    compact: bool = False,
+    orjson_safe: bool | None = None,
+) -> None:
+    """De-identify ``resource`` and write it to ``out`` as JSON.
+
+    Bundle entries are de-identified and encoded one at a time, so the
+    de-identified copy of a large Bundle never exists in memory all at once.
+    The output is JSON equivalent to ``dumps_resource(deidentify_resource(...))``
+    with the same layout. The encoder is chosen once, from the input
+    document, so all entries share one number format; the text can differ
+    from ``dumps_resource`` only when de-identification removes the sole value
+    that orjson cannot encode. ``orjson_safe`` is as for ``dumps_resource``.
+
+    ``resource`` is left unchanged. Streaming only pays off when the input
+    must be kept: a caller that can discard it uses less memory and time with
+    ``deidentify_resource(..., in_place=True)`` followed by ``dumps_resource``.
+    """
+    walk, phi_sets = _prepare_walk(resource, salt, shift_days, safe_harbor)
+    entries = _bundle_entries(resource, phi_sets)
+    if not entries:
+        out.write(dumps_resource(walk(resource), compact=compact, orjson_safe=orjson_safe))
+        out.write("\n")
+        return
+    # De-identification never introduces numbers orjson cannot encode.
+    use_orjson = _use_orjson(resource, compact, orjson_safe)
+
+    # Reproduce dumps_resource's layout by hand around the streamed entries.
+    # JSON strings never contain raw newlines, so re-indenting is a replace.
+    key_sep = ":" if compact else ": "
+    nl1, nl2 = ("", "") if compact else ("\n  ", "\n    ")
+
+    def nested(value: Any, newline: str) -> str:
+        text = _dumps(value, compact, use_orjson)
+        return text if compact else text.replace("\n", newline)
+
+    shell = walk({k: v for k, v in resource.items() if k != "entry"})
+    out.write("{")
+    first = True
+    for key in resource:
+        if key != "entry" and key not in shell:
+            continue
+        out.write(nl1 if first else "," + nl1)
+        first = False
+        out.write(json.dumps(key, ensure_ascii=False) + key_sep)
+        if key != "entry":
+            out.write(nested(shell[key], nl1))
+            continue
+        out.write("[")
+        for i, entry in enumerate(entries):
+            out.write(nl2 if i == 0 else "," + nl2)
+            out.write(nested(walk(entry), nl2))
+        out.write(nl1 + "]")
+    out.write("" if compact else "\n")
+    out.write("}\n")
+
+
+def deidentify_ndjson(
+    lines: Iterable[str],
+    out: TextIO,
+    salt: str,
+    shift_days: int | None,
+    *,
+    safe_harbor: bool = False,
+) -> int:
+    """De-identify newline-delimited JSON, one resource per line.
+
+    Each resource is parsed, de-identified and written to ``out`` before the
+    next line is read, so memory use does not grow with the input size. Blank
+    lines are skipped. Returns the number of resources written.
+    """
+    count = 0
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            resource = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {lineno}: {e}") from e
+        # Each parsed line is ours alone, so it can be modified in place
+        deid = deidentify_resource(
+            resource, salt, shift_days, safe_harbor=safe_harbor, in_place=True
+        )
+        out.write(dumps_resource(deid, compact=True))
+        out.write("\n")
+        count += 1
+    return count
+
+
+##########################
+# 3.  CLI HANDLER        #
+##########################
+
+def _non_negative_int(value: str) -> int:
+    """argparse ``type=`` for counts where 0 has a special meaning."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}") from None
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be >= 0, got {number}")
+    return number
+
+
+def parse_args() -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="De-identify a FHIR JSON resource.")
+    ap.add_argument("input", help="Path to input FHIR JSON file")
+    ap.add_argument("-o", "--output", help="Output path (default: <input>_deid.json)")
     ap.add_argument(
         "--salt",
         default=DEFAULT_SALT_PLACEHOLDER,
@@ -373,54 +924,76 @@ def parse_args() -> argparse.Namespace:
         "--salt-file",
         help="Path to a file containing the secret salt (takes precedence over --salt)",
     )
-    ap.add_argument(
-        "--shift-days",
-        type=int,
-        help="Shift all dates by N days (if omitted, a deterministic random offset is used)",
-    )
-    ap.add_argument(
-        "--policy",
-        help="Optional JSON file overriding the built-in PHI policy (see README)",
-    )
-    ap.add_argument("--verbose", action="store_true", help="Verbose logging to stderr")
+    ap.add_argument(
+        "--shift-days",
+        type=int,
+        help="Shift all dates by N days (if omitted, a deterministic random offset is used)",
+    )
+    ap.add_argument(
+        "--policy",
+        help="Optional JSON file overriding the built-in PHI policy (see README)",
+    )
+    ap.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write compact JSON without indentation (faster for large bundles; "
+        "implied by --ndjson)",
+    )
+    ap.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Treat input as NDJSON (one resource per line) and stream it line by line; "
+        "output is always compact and --jobs is not supported",
+    )
+    ap.add_argument(
+        "--jobs",
+        type=_non_negative_int,
+        default=1,
+        help="Worker processes for large Bundles (0 = one per CPU; default: 1; "
+        "not with --ndjson)",
+    )
+    ap.add_argument("--verbose", action="store_true", help="Verbose logging to stderr")
 
     ap.add_argument(
         "--safe-harbor",
         action="store_true",
         help="Enable HIPAA Safe Harbor mode: collapse dates to year precision and aggregate ages ≥90.",
     )
-    return ap.parse_args()
-
-
-def main() -> None:
-    args = parse_args()
-
-    # 1. Load external policy if provided (merge rather than replace)
-    if args.policy:
-        try:
-            with open(args.policy, "r", encoding="utf-8") as fh:
-                user_policy = json.load(fh)
+    args = ap.parse_args()
+    if args.ndjson and args.jobs != 1:
+        ap.error("--jobs cannot be combined with --ndjson")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+
+    # 1. Load external policy if provided (merge rather than replace)
+    if args.policy:
+        try:
+            with open(args.policy, "r", encoding="utf-8") as fh:
+                user_policy = json.load(fh)
             # Merge – user entries override built-ins
-            for k, v in user_policy.items():
+            for k, v in user_policy.items():
                 PHI_POLICY[k] = v
-        except Exception as e:
-            sys.exit(f"[ERROR] Cannot load policy file {args.policy}: {e}")
-
+        except Exception as e:
+            sys.exit(f"[ERROR] Cannot load policy file {args.policy}: {e}")
+
     # 2. Obtain salt securely
     salt: str | None = None
-    if args.salt_file:
-        try:
-            salt = Path(args.salt_file).read_text(encoding="utf-8").strip()
-        except Exception as e:
-            sys.exit(f"[ERROR] Cannot read salt file {args.salt_file}: {e}")
-    else:
-        salt = os.getenv("DEID_SALT", args.salt)
-
-    if not salt or salt == DEFAULT_SALT_PLACEHOLDER:
+    if args.salt_file:
+        try:
+            salt = Path(args.salt_file).read_text(encoding="utf-8").strip()
+        except Exception as e:
+            sys.exit(f"[ERROR] Cannot read salt file {args.salt_file}: {e}")
+    else:
+        salt = os.getenv("DEID_SALT", args.salt)
+
+    if not salt or salt == DEFAULT_SALT_PLACEHOLDER:
         print(
             "[WARN] Using the default salt. Provide a strong secret via --salt, --salt-file or DEID_SALT.",
             file=sys.stderr,
-        )
+        )
 
     # Allow streaming using "-" as stdin/stdout
     streaming_mode = args.input == "-"
@@ -439,41 +1012,76 @@ def main() -> None:
                 if args.output
                 else Path(args.input).with_stem(Path(args.input).stem + "_deid")
             )
-
+
+    to_stdout = (streaming_mode and output_path is None) or output_to_stdout
+
+    if args.ndjson:
+        src_name = "stdin" if streaming_mode else str(input_path)
+        dst_name = "stdout" if to_stdout else str(output_path)
+        try:
+            with contextlib.ExitStack() as stack:
+                src = sys.stdin if streaming_mode else stack.enter_context(
+                    open(input_path, "r", encoding="utf-8")
+                )
+                dst = sys.stdout if to_stdout else stack.enter_context(
+                    open(output_path, "w", encoding="utf-8")
+                )
+                count = deidentify_ndjson(
+                    src, dst, salt, args.shift_days, safe_harbor=args.safe_harbor
+                )
+        except Exception as e:
+            sys.exit(f"[ERROR] Cannot de-identify {src_name} → {dst_name}: {e}")
+
+        if args.verbose:
+            print(f"[INFO] De-identified {count} resources from {src_name} → {dst_name}", file=sys.stderr)
+        return
 
     try:
         if streaming_mode:
-            resource = json.load(sys.stdin)
+            resource, orjson_safe = _load_json(sys.stdin)
         else:
-            resource = load_resource(input_path)
+            with open(input_path, "r", encoding="utf-8") as fh:
+                resource, orjson_safe = _load_json(fh)
     except Exception as e:
         src = "stdin" if streaming_mode else str(input_path)
         sys.exit(f"[ERROR] Cannot read {src}: {e}")
-
-    deid = deidentify_resource(
-        resource, salt, args.shift_days, safe_harbor=args.safe_harbor
-    )
-
 
+    src_name = "stdin" if streaming_mode else input_path.name
+    dst_name = "stdout" if to_stdout else str(output_path)
+
+    # De-identify and encode before opening the output, so a failure never
+    # leaves a truncated file behind. The loaded resource is discarded after
+    # writing, so it is de-identified in place rather than copied.
+    jobs = args.jobs if args.jobs != 0 else (os.cpu_count() or 1)
     try:
-        if (streaming_mode and output_path is None) or output_to_stdout:
-            json.dump(deid, sys.stdout, indent=2, ensure_ascii=False)
-            sys.stdout.write("\n")
-        else:
+        deid = deidentify_resource(
+            resource,
+            salt,
+            args.shift_days,
+            safe_harbor=args.safe_harbor,
+            jobs=jobs,
+            in_place=True,
+        )
+        text = dumps_resource(deid, compact=args.compact, orjson_safe=orjson_safe)
+    except Exception as e:
+        sys.exit(f"[ERROR] Cannot de-identify {src_name}: {e}")
+
+    try:
+        with contextlib.ExitStack() as stack:
             # mypy: ignore[arg-type]
-            save_resource(deid, output_path)
+            dst = sys.stdout if to_stdout else stack.enter_context(
+                open(output_path, "w", encoding="utf-8")
+            )
+            dst.write(text)
+            dst.write("\n")
     except Exception as e:
-        dst = "stdout" if ((streaming_mode and output_path is None) or output_to_stdout) else str(output_path)
-        sys.exit(f"[ERROR] Cannot write {dst}: {e}")
-
-    if args.verbose:
-        removed = set(PHI_POLICY.get(resource.get("resourceType"), []) + PHI_POLICY.get("*", []))
+        sys.exit(f"[ERROR] Cannot write {dst_name}: {e}")
 
-        src_name = "stdin" if streaming_mode else input_path.name
-        dst_name = "stdout" if ((streaming_mode and output_path is None) or output_to_stdout) else str(output_path)
+    if args.verbose:
+        removed = set(PHI_POLICY.get(resource.get("resourceType"), []) + PHI_POLICY.get("*", []))
         print(f"[INFO] De-identified {src_name} → {dst_name}", file=sys.stderr)
         print(f"[INFO] Policy removed fields: {sorted(removed)}", file=sys.stderr)
-
-
-if __name__ == "__main__":
+
+
+if __name__ == "__main__":
     main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+profile_deid.py
+---------------
+Profile ``deidentify_resource`` (and serialisation) on a FHIR Bundle.
+
+Usage
+=====
+    python scripts/profile_deid.py [BUNDLE.json] [--entries N] [--top 20]
+
+Without an input file a synthetic Bundle of ``--entries`` Patient,
+Observation and Encounter resources is generated. The top functions by
+internal time are printed to stdout.
+
+(Named ``profile_deid`` rather than ``profile`` so it does not shadow the
+stdlib module that ``cProfile`` imports.)
+"""
+from __future__ import annotations
+
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from deidentify_fhir import deidentify_resource, dumps_resource, load_resource  # noqa: E402
+
+
+def synthetic_bundle(entries: int) -> Dict[str, Any]:
+    """Build a Bundle with a realistic mix of names, identifiers and dates."""
+    resources = []
+    for i in range(entries):
+        patient = f"Patient/p{i % 500}"
+        kind = i % 3
+        if kind == 0:
+            resource = {
+                "resourceType": "Patient",
+                "id": f"p{i % 500}",
+                "identifier": [
+                    {"system": "http://hospital.example.org/mrn", "value": f"MRN{i}"},
+                    {"system": "http://example.org/other", "value": f"X{i}"},
+                ],
+                "name": [{"family": "Doe", "given": ["Jane", "Q"]}],
+                "birthDate": "1960-04-12",
+                "gender": "female",
+            }
+        elif kind == 1:
+            resource = {
+                "resourceType": "Observation",
+                "id": f"o{i}",
+                "status": "final",
+                "subject": {"reference": patient},
+                "code": {"coding": [{"system": "http://loinc.org", "code": "8867-4"}]},
+                "effectiveDateTime": f"2024-03-{i % 28 + 1:02d}T12:30:45.123Z",
+                "issued": "2024-03-01T12:30:45Z",
+                "valueQuantity": {"value": 72 + i % 20, "unit": "/min"},
+            }
+        else:
+            resource = {
+                "resourceType": "Encounter",
+                "id": f"e{i}",
+                "status": "finished",
+                "subject": {"reference": patient},
+                "period": {"start": "2023-12-31T23:59:59-05:00", "end": "2024-01-01"},
+                "location": [{"location": {"reference": "Location/l1"}}],
+            }
+        resources.append({"fullUrl": f"urn:uuid:{i}", "resource": resource})
+    return {"resourceType": "Bundle", "type": "collection", "entry": resources}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Profile FHIR de-identification.")
+    ap.add_argument("input", nargs="?", help="FHIR JSON file (default: synthetic Bundle)")
+    ap.add_argument("--entries", type=int, default=100_000, help="Synthetic Bundle size")
+    ap.add_argument("--top", type=int, default=20, help="Number of functions to print")
+    args = ap.parse_args()
+
+    resource = load_resource(args.input) if args.input else synthetic_bundle(args.entries)
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    deid = deidentify_resource(resource, "profile-salt", None)
+    transformed = time.perf_counter()
+    dumps_resource(deid)
+    profiler.disable()
+    done = time.perf_counter()
+
+    print(f"de-identify: {transformed - start:.3f}s  serialise: {done - transformed:.3f}s")
+    pstats.Stats(profiler).sort_stats("tottime").print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -54,3 +54,48 @@ def test_unrelated_string_unchanged():
 
     deid = deidentify_resource(resource, salt="s", shift_days=400)
     assert deid["valueString"] == "1234"
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2024", _dt.datetime(2024, 1, 1)),
+        ("2024-02", _dt.datetime(2024, 2, 1)),
+        ("2024-02-29", _dt.datetime(2024, 2, 29)),
+        ("2024-01-01T10:00Z", _dt.datetime(2024, 1, 1, 10, 0)),
+        ("2024-01-01T10:00:00.12345+05:30", _dt.datetime(2024, 1, 1, 10, 0, 0, 123450)),
+        ("19600412", _dt.datetime(1960, 4, 12)),
+        ("2024-03-05T10:00:00+0100", _dt.datetime(2024, 3, 5, 10, 0, tzinfo=_dt.timezone(_dt.timedelta(hours=1)))),
+        ("2023-02-29", None),
+        ("2024/01/01", None),
+        ("2024-01-01T10:0", None),
+        ("2024-01-01T25:00:00", None),
+    ],
+)
+def test_parse_fhir_date(value, expected):
+    dt, _, _ = _parse_fhir_date(value)
+    assert dt == expected
+
+
+def test_year_only_period_boundary_shifted():
+    resource = {
+        "resourceType": "Encounter",
+        "id": "enc",
+        "period": {"start": "2024-01-01", "end": "2024"},
+    }
+
+    deid = deidentify_resource(resource, salt="s", shift_days=-400)
+
+    assert deid["period"]["start"] == "2022-11-27"
+    assert deid["period"]["end"] == "2022"
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("0999-01-01", "0997-11-27"),
+        ("0999-01", "0997-11"),
+    ],
+)
+def test_year_below_1000_keeps_four_digits(value, expected):
+    assert shift_date(value, -400) == expected
@@ -1,4 +1,6 @@
-from deidentify_fhir import pseudonymise_identifier
+import hashlib
+
+from deidentify_fhir import deterministic_offset, pseudonymise_identifier
 
 
 def test_hash_deterministic_default_length():
@@ -16,3 +18,11 @@ def test_hash_truncation():
     ident = {"system": "http://hospital.example.org/mrn", "value": "12345"}
     masked = pseudonymise_identifier(ident, salt, hash_length=16)
     assert len(masked["value"]) == 16
+
+
+def test_deterministic_offset_is_stable():
+    # Offsets must not change between releases, otherwise re-running the tool
+    # breaks date alignment with previously de-identified data.
+    digest = hashlib.sha256(b"s3cr3tPatient/123").digest()
+    expected = (int.from_bytes(digest[:4], "big") % 181) - 90
+    assert deterministic_offset("s3cr3t", "Patient/123") == expected
@@ -0,0 +1,84 @@
+import io
+import json
+
+import pytest
+
+from deidentify_fhir import (
+    _load_json,
+    deidentify_resource,
+    dump_deidentified,
+    dumps_resource,
+    load_resource,
+    orjson,
+    save_resource,
+)
+
+
+RESOURCE = {"resourceType": "Observation", "id": "o1", "valueString": "café", "valueInteger": 2**70}
+
+
+def test_pretty_output_matches_stdlib_indent():
+    assert dumps_resource(RESOURCE) == json.dumps(RESOURCE, indent=2, ensure_ascii=False)
+
+
+def test_compact_output_has_no_whitespace():
+    assert dumps_resource(RESOURCE, compact=True) == json.dumps(
+        RESOURCE, ensure_ascii=False, separators=(",", ":")
+    )
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_non_finite_floats_written_unchanged(compact):
+    resource = {"resourceType": "Observation", "values": [float("nan"), float("inf"), 1.5]}
+    text = dumps_resource(resource, compact=compact)
+    assert "NaN" in text and "Infinity" in text
+    if compact:
+        assert text == json.dumps(resource, ensure_ascii=False, separators=(",", ":"))
+    else:
+        assert text == json.dumps(resource, indent=2, ensure_ascii=False)
+
+
+@pytest.mark.parametrize(
+    "text, safe",
+    [
+        ('{"a": [1, -2, 1.5e20, 18446744073709551615]}', True),
+        ('{"a": NaN}', False),
+        ('{"a": [-Infinity]}', False),
+        ('{"a": {"b": 18446744073709551616}}', False),
+        ('{"a": -9223372036854775809}', False),
+    ],
+)
+def test_load_json_flags_numbers_orjson_would_alter(text, safe):
+    resource, orjson_safe = _load_json(io.StringIO(text))
+    assert json.dumps(resource) == json.dumps(json.loads(text))
+    if orjson is not None:
+        assert orjson_safe is safe
+    # Trusting the load-time flag gives the same text as scanning
+    assert dumps_resource(resource, orjson_safe=orjson_safe) == dumps_resource(resource)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "out.json"
+    save_resource(RESOURCE, path, compact=True)
+    assert path.read_text(encoding="utf-8").endswith("\n")
+    assert load_resource(path) == RESOURCE
+
+
+def test_streamed_bundle_matches_materialised_output():
+    bundle = {
+        "resourceType": "Bundle",
+        "type": "collection",
+        "entry": [
+            {"resource": {"resourceType": "Patient", "id": "p1", "name": [{"family": "Doe"}]}},
+            {"resource": {"resourceType": "Observation", "id": "o1", "issued": "2024-01-01T00:00:00Z"}},
+            {"resource": {"resourceType": "Observation", "id": "o2", "valueInteger": 2**70}},
+            {"resource": {"resourceType": "Observation", "id": "o3", "valueDecimal": 1e20}},
+        ],
+        "timestamp": "2024-05-05T00:00:00Z",
+        "meta": {},
+    }
+    for compact in (False, True):
+        out = io.StringIO()
+        dump_deidentified(bundle, out, salt="s", shift_days=3, compact=compact)
+        expected = dumps_resource(deidentify_resource(bundle, salt="s", shift_days=3), compact=compact)
+        assert out.getvalue() == expected + "\n"
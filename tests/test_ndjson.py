@@ -0,0 +1,32 @@
+import io
+import json
+
+import pytest
+
+from deidentify_fhir import deidentify_ndjson, deidentify_resource
+
+
+def test_ndjson_matches_single_resource_output():
+    resources = [
+        {"resourceType": "Patient", "id": "p1", "name": [{"family": "Doe"}]},
+        {
+            "resourceType": "Observation",
+            "id": "o1",
+            "subject": {"reference": "Patient/p1"},
+            "effectiveDateTime": "2024-01-01T00:00:00Z",
+        },
+    ]
+    lines = [json.dumps(r) + "\n" for r in resources]
+    lines.insert(1, "\n")  # blank lines are ignored
+    out = io.StringIO()
+
+    count = deidentify_ndjson(lines, out, salt="s", shift_days=None)
+
+    assert count == 2
+    written = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert written == [deidentify_resource(r, salt="s", shift_days=None) for r in resources]
+
+
+def test_ndjson_reports_bad_line():
+    with pytest.raises(ValueError, match="line 2"):
+        deidentify_ndjson(['{"resourceType": "Patient"}\n', "{not json\n"], io.StringIO(), "s", 0)
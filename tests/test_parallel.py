@@ -0,0 +1,30 @@
+from deidentify_fhir import PARALLEL_MIN_ENTRIES, deidentify_resource
+
+
+def _bundle(n):
+    return {
+        "resourceType": "Bundle",
+        "type": "collection",
+        "entry": [
+            {
+                "fullUrl": f"urn:uuid:{i}",
+                "resource": {
+                    "resourceType": "Patient",
+                    "id": f"p{i}",
+                    "name": [{"family": "Doe"}],
+                    "identifier": [{"system": "urn:system:mrn", "value": str(i)}],
+                    "deceasedDateTime": "2024-01-01T10:00:00Z",
+                },
+            }
+            for i in range(n)
+        ],
+        "timestamp": "2024-05-05T00:00:00Z",
+    }
+
+
+def test_parallel_bundle_matches_sequential():
+    bundle = _bundle(PARALLEL_MIN_ENTRIES + 1)
+    sequential = deidentify_resource(bundle, salt="s", shift_days=None)
+    parallel = deidentify_resource(bundle, salt="s", shift_days=None, jobs=2)
+    assert parallel == sequential
+    assert list(parallel) == list(sequential)
@@ -0,0 +1,27 @@
+import deidentify_fhir
+from deidentify_fhir import PHI_POLICY, _phi_field_sets, deidentify_resource
+
+
+def test_merged_sets_cached_until_policy_changes():
+    first = _phi_field_sets()
+    assert _phi_field_sets() is first
+
+    original = PHI_POLICY["Observation"]
+    try:
+        PHI_POLICY["Observation"] = original + ["note"]
+        updated = _phi_field_sets()
+        assert updated is not first
+        assert "note" in updated["Observation"]
+
+        obs = {"resourceType": "Observation", "id": "o", "note": [{"text": "x"}]}
+        assert "note" not in deidentify_resource(obs, salt="s", shift_days=0)
+    finally:
+        PHI_POLICY["Observation"] = original
+
+    assert "note" not in _phi_field_sets()["Observation"]
+
+
+def test_plain_dict_policy_still_supported(monkeypatch):
+    monkeypatch.setattr(deidentify_fhir, "PHI_POLICY", {"*": ["identifier", "text"]})
+    obs = {"resourceType": "Observation", "id": "o", "text": {"div": "x"}}
+    assert deidentify_resource(obs, salt="s", shift_days=0) == {"resourceType": "Observation", "id": "o"}
@@ -1,3 +1,5 @@
+import pytest
+
 from deidentify_fhir import deidentify_resource
 
 
@@ -30,3 +32,18 @@ def test_safe_harbor_truncates_skips_shifting_and_bins_ages():
     assert deid_encounter["period"]["start"] == "2024"
     assert deid_encounter["period"]["end"] == "2024"
 
+
+
+@pytest.mark.parametrize("birth_date", ["19600412", "1960-04-12T10:00:00+0100"])
+def test_safe_harbor_collapses_non_strict_iso_dates(birth_date):
+    """Dates outside the strict FHIR grammar must still be collapsed, not leaked."""
+    patient = {"resourceType": "Patient", "id": "p1", "birthDate": birth_date}
+    deid = deidentify_resource(patient, salt="s", shift_days=None, safe_harbor=True)
+    assert deid["birthDate"] == "1960"
+
+
+def test_safe_harbor_collapses_non_ascii_digit_dates():
+    """Unicode digits parse like ASCII ones and must not bypass collapsing."""
+    patient = {"resourceType": "Patient", "id": "p1", "birthDate": "２０２４-01-01"}
+    deid = deidentify_resource(patient, salt="s", shift_days=None, safe_harbor=True)
+    assert deid["birthDate"] == "2024"
@@ -0,0 +1,69 @@
+from deidentify_fhir import deidentify_resource, recursively_deidentify
+
+
+def test_deeply_nested_input_does_not_recurse():
+    depth = 5000
+    obj = leaf = {}
+    for _ in range(depth):
+        leaf["extension"] = {}
+        leaf = leaf["extension"]
+    leaf["identifier"] = {"system": "http://example.org/other", "value": "x"}
+
+    deid = recursively_deidentify(obj, salt="s", offset_days=0)
+
+    node = deid
+    for _ in range(depth):
+        node = node["extension"]
+    assert node == {}
+
+
+def test_key_order_preserved():
+    obj = {"a": {"x": 1}, "b": "text", "c": [{"y": 2}], "d": 3}
+    deid = recursively_deidentify(obj, salt="s", offset_days=0)
+    assert list(deid) == ["a", "b", "c", "d"]
+    assert deid == obj
+
+
+def test_primitive_list_is_copied():
+    obj = {"given": ["A", "B"], "mixed": ["x", {"identifier": {"value": "1"}}]}
+    deid = recursively_deidentify(obj, salt="s", offset_days=0)
+    assert deid == {"given": ["A", "B"], "mixed": ["x", {}]}
+    assert deid["given"] is not obj["given"]
+
+
+def test_in_place_matches_copy():
+    def patient():
+        return {
+            "resourceType": "Patient",
+            "id": "p1",
+            "identifier": [
+                {"system": "http://hospital.example.org/mrn", "value": "1"},
+                {"system": "http://example.org/other", "value": "2"},
+            ],
+            "name": [{"family": "Doe"}],
+            "deceasedDateTime": "2024-01-01",
+            "contained": [{"resourceType": "Organization", "telecom": [], "alias": ["a"]}],
+        }
+
+    copied = deidentify_resource(patient(), salt="s", shift_days=4)
+    original = patient()
+    mutated = deidentify_resource(original, salt="s", shift_days=4, in_place=True)
+
+    assert mutated is original
+    assert mutated == copied
+    assert list(mutated) == list(copied)
+
+
+def test_in_place_processes_shared_nodes_once():
+    period = {"start": "2024-01-01"}
+    obs = {
+        "resourceType": "Observation",
+        "effectivePeriod": period,
+        "component": [{"valuePeriod": period}, {"valuePeriod": period}],
+    }
+
+    deid = deidentify_resource(obs, salt="s", shift_days=4, in_place=True)
+
+    # Shifted once, not once per reference
+    assert period == {"start": "2024-01-05"}
+    assert deid["component"][1]["valuePeriod"] is period